@@ -9,14 +9,26 @@ Usage examples:
     ./madrecon.py -u example.com --skip ffuf,gobuster
 """
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 import argparse
+import asyncio
+import contextlib
+import json
+import mmap
+import multiprocessing
+import re
 import subprocess
 import os
 import sys
 import shutil
+import threading
 import time
 
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
 # --- Configure available tool names here (used for --only/--skip) ---
 ALL_TOOLS = [
     "subfinder",
@@ -38,39 +50,150 @@ ALL_TOOLS = [
     "httprobe",
 ]
 
+# Archive tools and the prefix of the file each one writes
+ARCHIVE_PREFIXES = {"waybackurls": "wayback", "gau": "gau"}
+
+# Helper binaries the pipeline shells out to besides the recon tools
+HELPER_TOOLS = ["sort", "sed"]
+
+# Resolved once at startup so neither ensure_tool nor execvp walk PATH per module
+TOOL_PATHS = {tool: shutil.which(tool) for tool in ALL_TOOLS + HELPER_TOOLS}
+
 # Tools that accept headers via '-H' or '--header' flags
 TOOLS_WITH_HEADERS = {"httpx", "nuclei", "dalfox", "katana", "ffuf", "gobuster"}
 
+# Kernel buffer for pipes we create (default is 64 KiB); lets bursty writers such
+# as waybackurls/gau keep going instead of blocking on a full pipe
+PIPE_SIZE = 1 << 20
+
+# Where gf looks up its pattern definitions (<name>.json); it uses the first
+# directory that exists
+GF_PATTERN_DIRS = ["~/.config/gf", "~/.gf"]
+
+# Byte-wise collation for sort: faster than locale-aware compares and gives the
+# same order as Python's sorted()
+SORT_ENV = dict(os.environ, LC_ALL="C")
+
+# sed script doing what merge_unique_python does per line: strip surrounding
+# whitespace and drop blank lines ([[:space:]] under LC_ALL=C is bytes.strip()'s set)
+STRIP_SED = r"s/^[[:space:]]+//;s/[[:space:]]+$//;/^$/d"
+
 # Helper functions
 def which(tool):
-    return shutil.which(tool) is not None
+    if tool not in TOOL_PATHS:
+        TOOL_PATHS[tool] = shutil.which(tool)
+    return TOOL_PATHS[tool] is not None
 
 def write_file(path, content):
     with open(path, "w", encoding="utf-8") as f:
         f.write(content if content is not None else "")
 
-def run_cmd(cmd, outpath=None):
+def record_error(outpath, cmd, e):
+    """
+    Note a command that could not be run in '<outpath>.err' and leave outpath
+    empty, so later stages never merge the message as if it were results.
+    """
+    with contextlib.suppress(OSError):
+        write_file(outpath, "")
+    write_file(outpath + ".err", f"Error executing command {cmd}: {e}\n")
+
+def popen_piped(cmd, **kwargs):
+    """subprocess.Popen that gives every pipe it creates a PIPE_SIZE buffer"""
+    if sys.version_info >= (3, 10):
+        return subprocess.Popen(cmd, pipesize=PIPE_SIZE, **kwargs)
+    proc = subprocess.Popen(cmd, **kwargs)
+    # F_SETPIPE_SZ is Linux only, where it is 1031; fcntl only exposes the name
+    # from 3.10, and elsewhere 1031 is some other command, so leave pipes alone
+    if fcntl is None or not (hasattr(fcntl, "F_SETPIPE_SZ") or sys.platform.startswith("linux")):
+        return proc
+    for pipe in (proc.stdin, proc.stdout, proc.stderr):
+        if pipe is not None:
+            try:
+                fcntl.fcntl(pipe.fileno(), getattr(fcntl, "F_SETPIPE_SZ", 1031), PIPE_SIZE)
+            except OSError:
+                pass
+    return proc
+
+def start_cmd(cmd, outpath, stdin=None, own_output=False):
     """
-    Runs command (list) and writes stdout+stderr to outpath if provided.
-    Returns tuple(stdout, stderr, returncode)
+    Starts command (list) with stdout streamed straight into outpath and stderr
+    into '<outpath>.err', so diagnostics never end up mixed into the result
+    lists. stdin may be a file path to feed the command.
+    own_output=True means cmd already writes outpath itself (its -o flag), so
+    its stdout is discarded instead; outpath is still truncated first so a
+    failed run never leaves an earlier run's results behind.
+    Returns the Popen, or None if the command could not be started.
     """
     try:
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        stdout = proc.stdout or ""
-        stderr = proc.stderr or ""
-        if outpath:
-            # write both stdout and stderr so we don't lose useful info
-            with open(outpath, "w", encoding="utf-8") as f:
-                if stdout:
-                    f.write(stdout)
-                if stderr:
-                    f.write("\n--- STDERR ---\n")
-                    f.write(stderr)
-        return stdout, stderr, proc.returncode
+        # the child writes directly into the files; no output is buffered in Python
+        with open(outpath + ".err", "wb") as ferr, open(outpath, "wb") as fout:
+            stdout = subprocess.DEVNULL if own_output else fout
+            if stdin:
+                with open(stdin, "rb") as src:
+                    return subprocess.Popen(cmd, stdin=src, stdout=stdout, stderr=ferr)
+            return subprocess.Popen(cmd, stdout=stdout, stderr=ferr)
     except Exception as e:
-        if outpath:
-            write_file(outpath, f"Error executing command {cmd}: {e}\n")
-        return "", str(e), 1
+        record_error(outpath, cmd, e)
+        return None
+
+def drop_empty_err(errpath):
+    """Remove a stderr capture file the tool never wrote to"""
+    if os.path.exists(errpath) and os.path.getsize(errpath) == 0:
+        os.remove(errpath)
+
+def wait_cmd(proc, outpath):
+    """Wait for a start_cmd process, drop its .err file if empty, return the returncode"""
+    rc = proc.wait() if proc is not None else 1
+    drop_empty_err(outpath + ".err")
+    return rc
+
+def run_cmd(cmd, outpath=None, stdin=None, own_output=False):
+    """
+    Runs command (list), streaming stdout straight into outpath if provided
+    (see start_cmd). Returns the process returncode.
+    """
+    if not outpath:
+        try:
+            return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+        except Exception:
+            return 1
+    return wait_cmd(start_cmd(cmd, outpath, stdin, own_output), outpath)
+
+async def run_cmd_async(cmd, outpath, stdin=None, own_output=False):
+    """
+    asyncio counterpart of run_cmd. Lets one event loop thread supervise
+    several tools instead of parking a pool thread on each of them.
+    """
+    proc = start_cmd(cmd, outpath, stdin, own_output)
+    if proc is not None:
+        await wait_exit(proc)
+    return wait_cmd(proc, outpath)
+
+async def wait_exit(proc):
+    """
+    Wait until proc has exited without reaping it. A pidfd becomes readable
+    on exit, so the loop watches it directly rather than relying on asyncio's
+    child watcher (a thread per child before Python 3.12).
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        fd = os.pidfd_open(proc.pid)
+    except (AttributeError, OSError):
+        await loop.run_in_executor(None, proc.wait)
+        return
+    exited = loop.create_future()
+    loop.add_reader(fd, lambda: exited.done() or exited.set_result(None))
+    try:
+        await exited
+    finally:
+        loop.remove_reader(fd)
+        os.close(fd)
+
+def run_async(*coros):
+    """Run coroutines concurrently on a private event loop; returns their results"""
+    async def gather():
+        return await asyncio.gather(*coros)
+    return asyncio.run(gather())
 
 def ensure_tool(tool, outdir):
     """Check presence of tool; if missing, create a missing file and return False"""
@@ -84,115 +207,235 @@ def safe_join(outdir, name):
     """Return a safe file path for outputs"""
     return os.path.join(outdir, name)
 
+def get_first_host(path):
+    """Return the first field of the first line of path (e.g. an httpx URL), or None"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    # mmap + find avoids decoding and splitting lines we never look at
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        nl = mm.find(b"\n")
+        fields = (mm[:nl] if nl >= 0 else mm[:]).split()
+    return fields[0].decode("utf-8", errors="ignore") if fields else None
+
+def archive_output(tool, domain, outdir):
+    """Path of the per-tool archive dump for tool (waybackurls/gau)"""
+    return safe_join(outdir, f"{ARCHIVE_PREFIXES[tool]}_{domain}.txt")
+
 # --- Module wrappers (each writes to its own file immediately) ---
 
-def subfinder_module(domain, outdir):
+def subfinder_module(domain, outdir, run=run_cmd):
     out = safe_join(outdir, f"subfinder_{domain}.txt")
     if not ensure_tool("subfinder", outdir):
         return
-    cmd = ["subfinder", "-d", domain, "-silent"]
-    run_cmd(cmd, out)
+    cmd = [TOOL_PATHS["subfinder"], "-d", domain, "-silent", "-o", out]
+    return run(cmd, out, own_output=True)
 
-def assetfinder_module(domain, outdir):
+def assetfinder_module(domain, outdir, run=run_cmd):
     out = safe_join(outdir, f"assetfinder_{domain}.txt")
     if not ensure_tool("assetfinder", outdir):
         return
-    cmd = ["assetfinder", "--subs-only", domain]
-    run_cmd(cmd, out)
+    cmd = [TOOL_PATHS["assetfinder"], "--subs-only", domain]
+    return run(cmd, out)
 
-def amass_module(domain, outdir):
+def amass_module(domain, outdir, run=run_cmd):
     out = safe_join(outdir, f"amass_{domain}.txt")
     if not ensure_tool("amass", outdir):
         return
-    cmd = ["amass", "enum", "-passive", "-d", domain]
-    run_cmd(cmd, out)
+    cmd = [TOOL_PATHS["amass"], "enum", "-passive", "-d", domain, "-o", out]
+    return run(cmd, out, own_output=True)
 
-def wayback_module(domain, outdir):
-    out = safe_join(outdir, f"wayback_{domain}.txt")
-    if not ensure_tool("waybackurls", outdir):
-        return
-    cmd = ["waybackurls", domain]
-    run_cmd(cmd, out)
-
-def gau_module(domain, outdir):
-    out = safe_join(outdir, f"gau_{domain}.txt")
-    if not ensure_tool("gau", outdir):
-        return
-    cmd = ["gau", domain]
-    run_cmd(cmd, out)
+def start_archive_tool(tool, domain, outdir, use_sort):
+    """
+    Start 'tool domain', piped through the STRIP_SED normalisation and
+    'sort -u' when use_sort, into its archive file. Returns (errpath, procs)
+    to wait on, or None if the tool could not be launched.
+    """
+    out = archive_output(tool, domain, outdir)
+    errpath = out + ".err"
+    procs = []  # stages started so far, torn down if a later one fails to launch
+    try:
+        with open(out, "wb") as fout, open(errpath, "wb") as ferr:
+            if not use_sort:
+                procs.append(subprocess.Popen([TOOL_PATHS[tool], domain], stdout=fout, stderr=ferr))
+                return errpath, procs
+            producer = popen_piped([TOOL_PATHS[tool], domain], stdout=subprocess.PIPE, stderr=ferr)
+            procs.append(producer)
+            strip = popen_piped([TOOL_PATHS["sed"], "-E", STRIP_SED], stdin=producer.stdout,
+                                stdout=subprocess.PIPE, stderr=ferr, env=SORT_ENV)
+            procs.append(strip)
+            procs.append(subprocess.Popen([TOOL_PATHS["sort"], "-u"], stdin=strip.stdout, stdout=fout,
+                                          stderr=ferr, env=SORT_ENV))
+            # only the next stage holds each read end now, so writers see EPIPE if it dies
+            producer.stdout.close()
+            strip.stdout.close()
+            return errpath, procs
+    except Exception as e:
+        for proc in procs:
+            if proc.stdout is not None:
+                proc.stdout.close()
+            proc.kill()
+            proc.wait()
+        record_error(out, [tool, domain], e)
+        return None
 
-def katana_module(domain, outdir, headers):
+def combined_archives_module(domain, outdir, tools=("waybackurls", "gau")):
+    """
+    Run the archive tools concurrently, each piped straight into its own
+    'sort -u' (tool | sort -u > file). Returns (archive files, True if they
+    are all sorted).
+    """
+    use_sort = which("sort") and which("sed")
+    outputs = []
+    running = []  # (errpath, [procs])
+    for tool in ARCHIVE_PREFIXES:
+        if tool not in tools or not ensure_tool(tool, outdir):
+            continue
+        outputs.append(archive_output(tool, domain, outdir))
+        started = start_archive_tool(tool, domain, outdir, use_sort)
+        if started is not None:
+            running.append(started)
+    for errpath, procs in running:
+        for proc in procs:
+            proc.wait()
+        drop_empty_err(errpath)
+    return outputs, use_sort
+
+def katana_module(domain, outdir, headers_argv):
     out = safe_join(outdir, f"katana_{domain}.txt")
     if not ensure_tool("katana", outdir):
         return
-    cmd = ["katana", "-u", domain, "-silent", "-depth", "2"]
+    cmd = [TOOL_PATHS["katana"], "-u", domain, "-silent", "-depth", "2", "-o", out]
     # katana supports -H style headers (per earlier requirements)
-    for h in headers:
-        cmd.extend(["-H", h])
-    run_cmd(cmd, out)
+    cmd += headers_argv
+    run_cmd(cmd, out, own_output=True)
 
-def httpx_module(input_file, outdir, headers):
+def httpx_module(input_file, outdir, headers_argv):
     out = safe_join(outdir, f"httpx_live_{os.path.basename(input_file)}.txt")
     if not ensure_tool("httpx", outdir):
         return
-    cmd = ["httpx", "-l", input_file, "-silent", "-status-code", "-title", "-follow-redirects"]
-    for h in headers:
-        cmd.extend(["-H", h])
-    run_cmd(cmd, out)
+    cmd = [TOOL_PATHS["httpx"], "-l", input_file, "-silent", "-status-code", "-title", "-follow-redirects",
+           "-o", out]
+    cmd += headers_argv
+    run_cmd(cmd, out, own_output=True)
 
-def nuclei_module(input_file, outdir, headers):
+def nuclei_module(input_file, outdir, headers_argv):
     out = safe_join(outdir, f"nuclei_{os.path.basename(input_file)}.txt")
     if not ensure_tool("nuclei", outdir):
         return
-    cmd = ["nuclei", "-l", input_file, "-silent"]
-    for h in headers:
-        cmd.extend(["-H", h])
-    run_cmd(cmd, out)
+    cmd = [TOOL_PATHS["nuclei"], "-l", input_file, "-silent", "-o", out]
+    cmd += headers_argv
+    run_cmd(cmd, out, own_output=True)
 
 def naabu_module(input_file, outdir):
     out = safe_join(outdir, f"naabu_{os.path.basename(input_file)}.txt")
     if not ensure_tool("naabu", outdir):
         return
-    cmd = ["naabu", "-list", input_file, "-silent", "-top-100"]
-    run_cmd(cmd, out)
+    cmd = [TOOL_PATHS["naabu"], "-list", input_file, "-silent", "-top-100", "-o", out]
+    run_cmd(cmd, out, own_output=True)
 
 def dnsx_module(input_file, outdir):
     out = safe_join(outdir, f"dnsx_{os.path.basename(input_file)}.txt")
     if not ensure_tool("dnsx", outdir):
         return
-    cmd = ["dnsx", "-l", input_file, "-silent"]
-    run_cmd(cmd, out)
+    cmd = [TOOL_PATHS["dnsx"], "-l", input_file, "-silent", "-o", out]
+    run_cmd(cmd, out, own_output=True)
 
-def ffuf_module(wordlist, url_template, outdir, headers):
+def ffuf_module(wordlist, url_template, outdir, headers_argv):
     out = safe_join(outdir, f"ffuf_{int(time.time())}.txt")
     if not ensure_tool("ffuf", outdir):
         return
-    cmd = ["ffuf", "-w", wordlist, "-u", url_template, "-mc", "200,301,302", "-s"]
-    for h in headers:
-        cmd.extend(["-H", h])
+    cmd = [TOOL_PATHS["ffuf"], "-w", wordlist, "-u", url_template, "-mc", "200,301,302", "-s"]
+    cmd += headers_argv
+    # ffuf's -o writes JSON by default; keep streaming its plain -s output instead
     run_cmd(cmd, out)
 
-def gobuster_module(wordlist, url, outdir, headers):
+def gobuster_module(wordlist, url, outdir, headers_argv):
     out = safe_join(outdir, f"gobuster_{int(time.time())}.txt")
     if not ensure_tool("gobuster", outdir):
         return
-    cmd = ["gobuster", "dir", "-w", wordlist, "-u", url, "-q"]
-    for h in headers:
-        cmd.extend(["-H", h])
-    run_cmd(cmd, out)
+    cmd = [TOOL_PATHS["gobuster"], "dir", "-w", wordlist, "-u", url, "-q", "-o", out]
+    cmd += headers_argv
+    run_cmd(cmd, out, own_output=True)
 
-def dalfox_module(input_file, outdir, headers):
+def dalfox_module(input_file, outdir, headers_argv):
     out = safe_join(outdir, f"dalfox_{os.path.basename(input_file)}.txt")
     if not ensure_tool("dalfox", outdir):
         return
-    cmd = ["dalfox", "file", input_file, "-o", out, "-silent"]
+    cmd = [TOOL_PATHS["dalfox"], "file", input_file, "-o", out, "-silent"]
     # dalfox accepts headers with '-H'
-    for h in headers:
-        cmd.extend(["-H", h])
-    # dalfox writes to file itself with -o, but we still run via run_cmd so a wrapper file is created
-    run_cmd(cmd, None)
+    cmd += headers_argv
+    # dalfox writes to file itself with -o; run_cmd only keeps its stderr
+    run_cmd(cmd, out, own_output=True)
 
-def gf_module(input_file, outdir):
+def ere_compatible(pattern):
+    """
+    True if pattern means the same to re as to 'grep -E'. Rejects the
+    re-only syntax ERE lacks: (?...) groups, lazy/possessive quantifiers,
+    backslash-letter/digit escapes (\\d, \\w, backrefs), POSIX classes like
+    [[:alpha:]], and backslashes inside brackets (literal in ERE).
+    """
+    if "(?" in pattern or "[:" in pattern:
+        return False
+    if re.search(r"[*+?}][?+]", pattern) or re.search(r"\\[A-Za-z0-9]", pattern):
+        return False
+    return not re.search(r"\[[^\]]*\\", pattern)
+
+def load_gf_pattern(name):
+    """
+    Return (regex, re_flags) equivalent to 'gf name', or None when the pattern
+    file is missing or uses grep features we can't reproduce with re.
+    """
+    # like gf: the first pattern directory that exists is the only one searched
+    dirs = [os.path.expanduser(d) for d in GF_PATTERN_DIRS]
+    pattern_dir = next((d for d in dirs if os.path.isdir(d)), dirs[-1])
+    path = os.path.join(pattern_dir, f"{name}.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+    except (OSError, ValueError):
+        return None
+    flags = spec.get("flags", "").lstrip("-")
+    # only plain 'grep -E' / 'grep -iE' patterns; anything else goes through gf itself
+    if spec.get("engine") or "E" not in flags or not set(flags) <= {"i", "E", "a"}:
+        return None
+    if spec.get("patterns"):
+        pattern = "(" + "|".join(spec["patterns"]) + ")"
+    else:
+        pattern = spec.get("pattern", "")
+    if not pattern or not ere_compatible(pattern):
+        return None
+    # re.IGNORECASE on bytes folds ASCII only; grep -i under a UTF-8 locale folds more
+    if "i" in flags and not pattern.isascii():
+        return None
+    re_flags = re.IGNORECASE if "i" in flags else 0
+    try:
+        re.compile(pattern.encode(), re_flags)
+    except re.error:
+        return None
+    return pattern.encode(), re_flags
+
+def gf_classify(input_file, rules):
+    """
+    Single pass over input_file: each line is written to the output of every
+    (regex, re_flags, outpath) rule it matches, like running grep once per rule.
+    Lines are matched without their newline, as grep does, so a negated
+    bracket like [^&] cannot match the line end. Matching is byte-wise, like
+    grep under LC_ALL=C: in a UTF-8 locale '.' or [^x] also matches a whole
+    multi-byte character where this needs one byte per position.
+    """
+    with contextlib.ExitStack() as stack:
+        compiled = [(re.compile(rx, fl), stack.enter_context(open(out, "wb"))) for rx, fl, out in rules]
+        with open(input_file, "rb") as src:
+            for line in src:
+                line = line.rstrip(b"\n")
+                for rx, out in compiled:
+                    if rx.search(line):
+                        out.write(line)
+                        out.write(b"\n")
+
+def gf_module(input_file, outdir, get_cpu_pool=None):
     # gf is usually used as filter; write multiple param files
     base = os.path.splitext(os.path.basename(input_file))[0]
     outputs = {}
@@ -201,206 +444,322 @@ def gf_module(input_file, outdir):
     # common gf patterns we want
     patterns = {"xss": f"{base}_gf_xss.txt", "sqli": f"{base}_gf_sqli.txt",
                 "redirect": f"{base}_gf_redirect.txt", "ssrf": f"{base}_gf_ssrf.txt"}
+    specs = {pat: load_gf_pattern(pat) for pat in patterns}
+    if all(specs.values()):
+        # every pattern is a plain ERE: classify the whole list in one scan
+        # instead of four gf/grep processes each reading it again
+        rules = []
+        for pat, name in patterns.items():
+            outputs[pat] = safe_join(outdir, name)
+            rules.append((*specs[pat], outputs[pat]))
+        if get_cpu_pool is not None:
+            get_cpu_pool().submit(gf_classify, input_file, rules).result()
+        else:
+            gf_classify(input_file, rules)
+        return outputs
+    # one gf per pattern, all reading the input file directly and running concurrently
+    jobs = []
     for pat, name in patterns.items():
-        out = safe_join(outdir, name)
-        cmd = ["bash", "-lc", f"cat {input_file} | gf {pat} || true"]
-        stdout, stderr, rc = run_cmd(cmd, out)
-        outputs[pat] = out
+        outputs[pat] = safe_join(outdir, name)
+        jobs.append(run_cmd_async([TOOL_PATHS["gf"], pat], outputs[pat], stdin=input_file))
+    run_async(*jobs)
     return outputs
 
-def uro_module(input_files, outdir):
+def uro_module(input_file, outdir):
     out = safe_join(outdir, f"uro_{int(time.time())}.txt")
     if not ensure_tool("uro", outdir):
         return
-    # uro expects stdin - we'll cat all inputs into it
-    cmd = ["bash", "-lc", f"cat {' '.join(input_files)} | uro || true"]
-    run_cmd(cmd, out)
+    # uro expects stdin - feed the input file directly
+    run_cmd([TOOL_PATHS["uro"]], out, stdin=input_file)
 
 def unfurl_module(input_file, outdir):
     out = safe_join(outdir, f"unfurl_{os.path.basename(input_file)}.txt")
     if not ensure_tool("unfurl", outdir):
         return
-    cmd = ["unfurl", "keys", "-i", input_file]
+    cmd = [TOOL_PATHS["unfurl"], "keys", "-i", input_file]
     run_cmd(cmd, out)
 
 def httprobe_module(input_file, outdir):
     out = safe_join(outdir, f"httprobe_{os.path.basename(input_file)}.txt")
     if not ensure_tool("httprobe", outdir):
         return
-    cmd = ["httprobe"]
     # httprobe reads from stdin
-    cmd = ["bash", "-lc", f"cat {input_file} | httprobe -prefer-https || true"]
-    run_cmd(cmd, out)
+    cmd = [TOOL_PATHS["httprobe"], "-prefer-https"]
+    run_cmd(cmd, out, stdin=input_file)
 
 # --- Orchestration ---
 
-def merge_unique(files, dest):
-    """Merge multiple files into dest with unique sorted lines"""
+def merge_unique(files, dest, get_cpu_pool=None, presorted=False):
+    """
+    Merge multiple files into dest with unique sorted lines.
+    If get_cpu_pool (see make_lazy_cpu_pool) is given, the pure-Python fallback
+    runs in that process pool so it does not compete with the orchestrator
+    threads for the GIL.
+    presorted=True means every input is already normalised and sorted
+    (LC_ALL=C), as the archive pipeline writes them, so sort only has to do a
+    linear merge.
+    """
+    existing = [f for f in files if os.path.exists(f)]
+    if not existing:
+        write_file(dest, "")
+        return
+    # GNU sort does an external, multi-threaded merge sort with bounded memory,
+    # which is far cheaper than a Python set for multi-million-line archive dumps
+    if which("sort") and which("sed"):
+        try:
+            with open(dest, "wb") as out:
+                if presorted:
+                    proc = subprocess.run([TOOL_PATHS["sort"], "-u", "-m", *existing], stdout=out,
+                                          stderr=subprocess.DEVNULL, env=SORT_ENV)
+                    ok = proc.returncode == 0
+                else:
+                    # sed normalises lines first so both merge paths write identical files
+                    strip = popen_piped([TOOL_PATHS["sed"], "-E", STRIP_SED, *existing], stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, env=SORT_ENV)
+                    sorter = subprocess.Popen([TOOL_PATHS["sort"], "-u", f"--parallel={os.cpu_count() or 1}",
+                                               "-S", "512M"], stdin=strip.stdout, stdout=out,
+                                              stderr=subprocess.DEVNULL, env=SORT_ENV)
+                    strip.stdout.close()
+                    # reap both before deciding, so no sed is left behind on a fallback
+                    sort_rc, sed_rc = sorter.wait(), strip.wait()
+                    ok = sort_rc == 0 and sed_rc == 0
+            if ok:
+                return
+        except OSError:
+            pass
+    if get_cpu_pool is not None:
+        get_cpu_pool().submit(merge_unique_python, existing, dest).result()
+    else:
+        merge_unique_python(existing, dest)
+
+def merge_unique_python(files, dest):
+    """Fallback for merge_unique when sort is unavailable or fails"""
+    # bytes throughout: tool output is only deduped and written back, never decoded
     lines = set()
     for f in files:
-        if os.path.exists(f):
-            with open(f, "r", encoding="utf-8", errors="ignore") as fh:
-                for l in fh:
-                    l = l.strip()
-                    if l:
-                        lines.add(l)
-    with open(dest, "w", encoding="utf-8") as out:
-        for l in sorted(lines):
-            out.write(l + "\n")
-
-def prepare_subdomains(outdir, domain):
-    """Run subdomain enumeration tools in parallel and merge results"""
-    tools = [subfinder_module, assetfinder_module, amass_module]
-    temp_files = []
-    with ThreadPoolExecutor(max_workers=3) as ex:
-        futures = {ex.submit(func, domain, outdir): func for func in tools}
-        for fut in as_completed(futures):
-            func = futures[fut]
-            # nothing required here; modules write files themselves
-    # expected produced files:
-    temp_files = [
-        os.path.join(outdir, f"subfinder_{domain}.txt"),
-        os.path.join(outdir, f"assetfinder_{domain}.txt"),
-        os.path.join(outdir, f"amass_{domain}.txt")
-    ]
-    merged = os.path.join(outdir, f"all_subs_{domain}.txt")
-    merge_unique(temp_files, merged)
+        if not os.path.exists(f) or os.path.getsize(f) == 0:
+            continue
+        # mmap.readline scans the mapped file directly, skipping the buffered reader
+        with open(f, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for l in iter(mm.readline, b""):
+                l = l.strip()
+                if l:
+                    lines.add(l)
+    with open(dest, "wb") as out:
+        if lines:
+            out.write(b"\n".join(sorted(lines)))
+            out.write(b"\n")
+
+def usable_cpus():
+    """CPUs this process may run on (respects taskset/cgroup limits where supported)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def pin_worker(cores):
+    """ProcessPoolExecutor initializer: pin this worker process to the next free core"""
+    try:
+        os.sched_setaffinity(0, {cores.get()})
+    except (AttributeError, OSError):
+        pass
+
+def make_cpu_pool():
+    """Process pool with one worker per usable CPU, each pinned to its own core"""
+    cpus = usable_cpus()
+    if not hasattr(os, "sched_setaffinity"):
+        return ProcessPoolExecutor(max_workers=len(cpus))
+    cores = multiprocessing.SimpleQueue()
+    for cpu in cpus:
+        cores.put(cpu)
+    return ProcessPoolExecutor(max_workers=len(cpus), initializer=pin_worker, initargs=(cores,))
+
+def make_lazy_cpu_pool():
+    """
+    Return get_pool(), which builds the process pool on its first call only,
+    i.e. when the merge fallback or the gf scan actually needs it. Until then
+    get_pool.pool is None, so runs that never need it fork no workers.
+    """
+    lock = threading.Lock()
+    def get_pool():
+        with lock:
+            if get_pool.pool is None:
+                get_pool.pool = make_cpu_pool()
+            return get_pool.pool
+    get_pool.pool = None
+    return get_pool
+
+def build_index(outdir):
+    """Write outputs_index.txt listing every file present in outdir"""
+    entries = sorted(os.scandir(outdir), key=lambda e: e.name)
+    with open(os.path.join(outdir, "outputs_index.txt"), "w", encoding="utf-8") as f:
+        # stream names straight to the file instead of building a joined string
+        for entry in entries:
+            f.write(entry.name)
+            f.write("\n")
+
+def enumerate_subdomains(domain, outdir, get_cpu_pool=None):
+    """Run the subdomain enumerators concurrently on one event loop and merge results"""
+    # the wrappers hand back run_cmd_async coroutines here; called plainly they run synchronously
+    jobs = [module(domain, outdir, run=run_cmd_async)
+            for module in (subfinder_module, assetfinder_module, amass_module)]
+    run_async(*[job for job in jobs if job is not None])
+    merged = safe_join(outdir, f"all_subs_{domain}.txt")
+    merge_unique([safe_join(outdir, f"{name}_{domain}.txt") for name in ("subfinder", "assetfinder", "amass")],
+                 merged, get_cpu_pool)
     return merged
 
-def prepare_urls_from_archives(outdir, domain):
-    """Run wayback and gau in parallel and merge"""
-    with ThreadPoolExecutor(max_workers=2) as ex:
-        ex.submit(wayback_module, domain, outdir)
-        ex.submit(gau_module, domain, outdir)
-    wayback = os.path.join(outdir, f"wayback_{domain}.txt")
-    gauf = os.path.join(outdir, f"gau_{domain}.txt")
-    urls_all = os.path.join(outdir, f"urls_all_{domain}.txt")
-    merge_unique([wayback, gauf], urls_all)
+def archives_stage(domain, outdir, enabled, get_cpu_pool=None):
+    """Crawl the enabled archive sources once and merge them into urls_all"""
+    tools = [t for t in ARCHIVE_PREFIXES if t in enabled]
+    outputs, presorted = combined_archives_module(domain, outdir, tools)
+    urls_all = safe_join(outdir, f"urls_all_{domain}.txt")
+    # sorted dumps only need a linear 'sort -m' merge
+    merge_unique(outputs, urls_all, get_cpu_pool, presorted=presorted)
     return urls_all
 
+def ffuf_stage(first_host, outdir, headers_argv):
+    # require the user to place a wordlist at ./wordlists/common.txt or skip
+    wl = "wordlists/common.txt"
+    if os.path.exists(wl):
+        # Example template: httpx results might have scheme+host - first live host is the template
+        if first_host:
+            # ffuf expects a URL template, e.g. https://example/FUZZ
+            url_template = first_host.rstrip("/") + "/FUZZ"
+            ffuf_module(wl, url_template, outdir, headers_argv)
+    else:
+        write_file(safe_join(outdir, "ffuf_missing_wordlist.txt"),
+                   "ffuf wordlist not found at wordlists/common.txt; skipping ffuf.\n")
+
+def gobuster_stage(first_host, outdir, headers_argv):
+    wl = "wordlists/common.txt"
+    if os.path.exists(wl):
+        # first host is the target
+        if first_host:
+            gobuster_module(wl, first_host, outdir, headers_argv)
+    else:
+        write_file(safe_join(outdir, "gobuster_missing_wordlist.txt"),
+                   "gobuster wordlist not found at wordlists/common.txt; skipping gobuster.\n")
+
 def run_all(domain, outdir, headers, threads, only_set=None, skip_set=None):
     # Create directory
     os.makedirs(outdir, exist_ok=True)
 
-    # Step 1: subdomains
-    if (only_set and "subfinder" not in only_set) or (skip_set and "subfinder" in skip_set):
-        # skip subfinder explicitly
-        pass
-    subdomains_file = prepare_subdomains(outdir, domain)
-
-    # Also run katana, wayback, gau in parallel
-    tasks = []
-    with ThreadPoolExecutor(max_workers=threads) as ex:
-        # katana (crawler)
-        if (not only_set or "katana" in only_set) and (not skip_set or "katana" not in skip_set):
-            tasks.append(ex.submit(katana_module, domain, outdir, headers))
-        # archives
-        if (not only_set or "waybackurls" in only_set) and (not skip_set or "waybackurls" not in skip_set):
-            tasks.append(ex.submit(wayback_module, domain, outdir))
-        if (not only_set or "gau" in only_set) and (not skip_set or "gau" not in skip_set):
-            tasks.append(ex.submit(gau_module, domain, outdir))
-        # assetfinder/amass already run in prepare_subdomains
-        # wait for the archive tasks to finish so urls_all exists
-        for t in as_completed(tasks):
-            pass
+    # Tools to run: --only narrows ALL_TOOLS, --skip removes from it
+    enabled = set(ALL_TOOLS)
+    if only_set:
+        enabled &= only_set
+    if skip_set:
+        enabled -= skip_set
+
+    # '-H value' pairs for every tool that takes headers, built once
+    headers_argv = [arg for h in headers for arg in ("-H", h)]
+
+    # One thread pool for the whole run drives the subprocess-bound modules;
+    # Python-side CPU work (merge fallback, gf scan) goes to a process pool that is
+    # only created if one of them actually runs, with one pinned worker per core.
+    # The threads mostly wait on tools, so --threads is not capped at the core
+    # count, and they are not pinned because every tool they spawn would inherit
+    # the single-core affinity.
+    io_pool = ThreadPoolExecutor(max_workers=threads)
+    get_cpu_pool = make_lazy_cpu_pool()
+    try:
+        run_stages(io_pool, get_cpu_pool, domain, outdir, headers_argv, enabled)
+    finally:
+        io_pool.shutdown(wait=True)
+        if get_cpu_pool.pool is not None:
+            get_cpu_pool.pool.shutdown(wait=True)
+    print(f"Madrecon run completed. Outputs are in: {outdir}")
 
-    urls_all = os.path.join(outdir, f"urls_all_{domain}.txt")
-    merge_unique([os.path.join(outdir, f"wayback_{domain}.txt"),
-                  os.path.join(outdir, f"gau_{domain}.txt")], urls_all)
+def run_stages(io_pool, get_cpu_pool, domain, outdir, headers_argv, enabled):
+    """
+    Schedule every module as a node of a dependency graph. A node is handed
+    to the pool as soon as its real prerequisites have finished, so
+    independent tools (nuclei, naabu, dnsx, dalfox, uro, ...) overlap instead
+    of running one after the other, and no worker sits blocked on upstream work.
+    """
+    subdomains_file = safe_join(outdir, f"all_subs_{domain}.txt")
+    urls_all = safe_join(outdir, f"urls_all_{domain}.txt")
+    httpx_out = safe_join(outdir, f"httpx_live_{os.path.basename(subdomains_file)}.txt")
 
-    # Step 2: probe live subdomains with httpx (depends on subdomains)
-    if (not only_set or "httpx" in only_set) and (not skip_set or "httpx" not in skip_set):
-        # httpx accepts headers
-        httpx_module(subdomains_file, outdir, headers)
+    nodes = {}  # node name -> (deps, fn, args)
+    done = {}   # node name -> Future, once submitted
 
-    # Step 3: run dnsx / naabu / nuclei against live hosts or subs
-    # Decide input file for port scanning and nuclei: prefer httpx live output if present
-    httpx_out = safe_join(outdir, f"httpx_live_{os.path.basename(subdomains_file)}.txt")
-    if os.path.exists(httpx_out):
-        input_for_scans = httpx_out
-    else:
-        input_for_scans = subdomains_file
+    def schedule(name, deps, fn, *args):
+        # nodes are declared in dependency order; deps on disabled tools are dropped
+        nodes[name] = ([d for d in deps if d in nodes], fn, args)
+
+    def scan_input():
+        # prefer httpx live output if present, resolved once httpx has finished
+        return httpx_out if os.path.exists(httpx_out) else subdomains_file
 
-    # dnsx
-    if (not only_set or "dnsx" in only_set) and (not skip_set or "dnsx" not in skip_set):
-        dnsx_module(input_for_scans, outdir)
+    # Step 1: subdomains
+    schedule("subs", [], enumerate_subdomains, domain, outdir, get_cpu_pool)
+
+    # katana (crawler) and archives need nothing but the domain
+    if "katana" in enabled:
+        schedule("katana", [], katana_module, domain, outdir, headers_argv)
+    schedule("urls_all", [], archives_stage, domain, outdir, enabled, get_cpu_pool)
 
-    # naabu
-    if (not only_set or "naabu" in only_set) and (not skip_set or "naabu" not in skip_set):
-        naabu_module(input_for_scans, outdir)
+    # Step 2: probe live subdomains with httpx (depends on subdomains)
+    if "httpx" in enabled:
+        schedule("httpx", ["subs"], httpx_module, subdomains_file, outdir, headers_argv)
 
-    # nuclei (supports headers)
-    if (not only_set or "nuclei" in only_set) and (not skip_set or "nuclei" not in skip_set):
-        nuclei_module(input_for_scans, outdir, headers)
+    # Step 3: dnsx / naabu / nuclei against live hosts or subs
+    if "dnsx" in enabled:
+        schedule("dnsx", ["subs", "httpx"], lambda: dnsx_module(scan_input(), outdir))
+    if "naabu" in enabled:
+        schedule("naabu", ["subs", "httpx"], lambda: naabu_module(scan_input(), outdir))
+    if "nuclei" in enabled:
+        schedule("nuclei", ["subs", "httpx"], lambda: nuclei_module(scan_input(), outdir, headers_argv))
 
     # Step 4: parameter extraction and XSS scanning from urls_all
-    if os.path.exists(urls_all):
+    if "gf" in enabled:
         # use gf to create param-specific lists
-        if (not only_set or "gf" in only_set) and (not skip_set or "gf" not in skip_set):
-            gf_outputs = gf_module(urls_all, outdir)  # returns dict with xss/sqli/etc file names
-            if gf_outputs and "xss" in gf_outputs:
-                xss_file = gf_outputs["xss"]
-                # dalfox
-                if (not only_set or "dalfox" in only_set) and (not skip_set or "dalfox" not in skip_set):
-                    dalfox_module(xss_file, outdir, headers)
-
-        # uro - filter and dedupe urls
-        if (not only_set or "uro" in only_set) and (not skip_set or "uro" not in skip_set):
-            uro_module([urls_all], outdir)
-
-        # unfurl keys
-        if (not only_set or "unfurl" in only_set) and (not skip_set or "unfurl" not in skip_set):
-            unfurl_module(urls_all, outdir)
-
-    # Step 5: httprobe on subs or urls list
-    if (not only_set or "httprobe" in only_set) and (not skip_set or "httprobe" not in skip_set):
-        httprobe_module(subdomains_file, outdir)
+        schedule("gf", ["urls_all"], gf_module, urls_all, outdir, get_cpu_pool)  # returns dict with xss/sqli/etc file names
+        if "dalfox" in enabled:
+            def run_dalfox():
+                gf_outputs = done["gf"].result()
+                if gf_outputs and "xss" in gf_outputs:
+                    dalfox_module(gf_outputs["xss"], outdir, headers_argv)
+            schedule("dalfox", ["gf"], run_dalfox)
+    # uro - filter and dedupe urls
+    if "uro" in enabled:
+        schedule("uro", ["urls_all"], uro_module, urls_all, outdir)
+    # unfurl keys
+    if "unfurl" in enabled:
+        schedule("unfurl", ["urls_all"], unfurl_module, urls_all, outdir)
+
+    # Step 5: httprobe on subs
+    if "httprobe" in enabled:
+        schedule("httprobe", ["subs"], httprobe_module, subdomains_file, outdir)
 
     # Step 6: fuzzers (ffuf/gobuster) - these require wordlists and urls; we provide examples but do not auto-run large jobs
     # The script will only run ffuf/gobuster if the user explicitly requested them via --only or not skipped.
-    if (not only_set or "ffuf" in only_set) and (not skip_set or "ffuf" not in skip_set):
-        # require the user to place a wordlist at ./wordlists/common.txt or skip
-        wl = "wordlists/common.txt"
-        if os.path.exists(wl):
-            # Example template: httpx results might have scheme+host - pick first live host for template
-            first_host = None
-            if os.path.exists(input_for_scans):
-                with open(input_for_scans, "r", encoding="utf-8", errors="ignore") as fh:
-                    for line in fh:
-                        first_host = line.strip().split()[0]
-                        if first_host:
-                            break
-            if first_host:
-                # ffuf expects a URL template, e.g. https://example/FUZZ
-                url_template = first_host.rstrip("/") + "/FUZZ"
-                ffuf_module(wl, url_template, outdir, headers)
-        else:
-            write_file(safe_join(outdir, "ffuf_missing_wordlist.txt"),
-                       "ffuf wordlist not found at wordlists/common.txt; skipping ffuf.\n")
-
-    if (not only_set or "gobuster" in only_set) and (not skip_set or "gobuster" not in skip_set):
-        wl = "wordlists/common.txt"
-        if os.path.exists(wl):
-            # pick first host as target
-            first_host = None
-            if os.path.exists(input_for_scans):
-                with open(input_for_scans, "r", encoding="utf-8", errors="ignore") as fh:
-                    for line in fh:
-                        first_host = line.strip().split()[0]
-                        if first_host:
-                            break
-            if first_host:
-                gobuster_module(wl, first_host, outdir, headers)
-        else:
-            write_file(safe_join(outdir, "gobuster_missing_wordlist.txt"),
-                       "gobuster wordlist not found at wordlists/common.txt; skipping gobuster.\n")
+    if "ffuf" in enabled or "gobuster" in enabled:
+        # both fuzzers target the same host; read it once
+        schedule("first_host", ["subs", "httpx"], lambda: get_first_host(scan_input()))
+    if "ffuf" in enabled:
+        schedule("ffuf", ["first_host"], lambda: ffuf_stage(done["first_host"].result(), outdir, headers_argv))
+    if "gobuster" in enabled:
+        schedule("gobuster", ["first_host"], lambda: gobuster_stage(done["first_host"].result(), outdir, headers_argv))
+
+    # Dispatch: submit every node whose deps are done, then sleep until the
+    # next future completes and re-check what it unblocked
+    running = {}  # Future -> node name
+    while nodes or running:
+        for name, (deps, fn, args) in list(nodes.items()):
+            if all(d in done and done[d].done() for d in deps):
+                done[name] = io_pool.submit(fn, *args)
+                running[done[name]] = name
+                del nodes[name]
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for fut in finished:
+            name = running.pop(fut)
+            if fut.exception() is not None:
+                print(f"Module {name} failed: {fut.exception()}")
 
     # Final: create a merged 'summary' file listing outputs present
-    summary = []
-    for fname in sorted(os.listdir(outdir)):
-        summary.append(fname)
-    write_file(os.path.join(outdir, "outputs_index.txt"), "\n".join(summary))
-    print(f"Madrecon run completed. Outputs are in: {outdir}")
+    build_index(outdir)
 
 # --- CLI / Arg parsing ---
 